@@ -0,0 +1,127 @@
+# Minimal interpreter for the subset of the Amazon States Language used by the mapping chain:
+# Task and Pass states with Parameters, ResultSelector and ResultPath, JsonPath references,
+# and the States.Format and States.StringToJson intrinsic functions. Task resources are
+# delegated to a callback so that tests can stub the services they call.
+import json
+import re
+
+PATH_SEGMENT = re.compile(r"\.([^.\[]+)|\[(\d+)\]")
+
+def walk_states(states):
+    """Yield every state, including the states of map item processors."""
+    for name, state in states.items():
+        yield name, state
+        processor = state.get("ItemProcessor") or state.get("Iterator")
+        if processor:
+            yield from walk_states(processor["States"])
+
+def read_path(expression, data, context):
+    if expression.startswith("$$"):
+        value, rest = context, expression[2:]
+    else:
+        value, rest = data, expression[1:]
+    for name, index in PATH_SEGMENT.findall(rest):
+        value = value[int(index)] if index else value[name]
+    return value
+
+def _split_arguments(arguments):
+    """Split intrinsic function arguments, keeping string literals as lists of (char, escaped)."""
+    result, i = [], 0
+    while i < len(arguments):
+        if arguments[i] in ", ":
+            i += 1
+        elif arguments[i] == "'":
+            literal, i = [], i + 1
+            while arguments[i] != "'":
+                if arguments[i] == "\\":
+                    # Escaped quote, brace or backslash, taken literally
+                    i += 1
+                    literal.append((arguments[i], True))
+                else:
+                    literal.append((arguments[i], False))
+                i += 1
+            result.append(literal)
+            i += 1
+        else:
+            start, depth = i, 0
+            while i < len(arguments) and (depth or arguments[i] != ","):
+                depth += {"(": 1, ")": -1}.get(arguments[i], 0)
+                i += 1
+            result.append(arguments[start:i].strip())
+    return result
+
+def evaluate(expression, data, context):
+    """Evaluate a JsonPath or an intrinsic function call."""
+    if not expression.startswith("States."):
+        return read_path(expression, data, context)
+    name, arguments = expression[:-1].split("(", 1)
+    values = [
+        argument if isinstance(argument, list) else evaluate(argument, data, context)
+        for argument in _split_arguments(arguments)
+    ]
+    if name == "States.StringToJson":
+        return json.loads(values[0])
+    if name == "States.Format":
+        template, args = values[0], iter(values[1:])
+        text, i = [], 0
+        while i < len(template):
+            char, escaped = template[i]
+            if char == "{" and not escaped and i + 1 < len(template) and template[i + 1] == ("}", False):
+                value = next(args)
+                text.append(value if isinstance(value, str) else json.dumps(value))
+                i += 2
+            else:
+                text.append(char)
+                i += 1
+        return "".join(text)
+    raise ValueError("Intrinsic function {} is not supported".format(name))
+
+def resolve(template, data, context):
+    """Resolve a Parameters, ItemSelector or ResultSelector payload template."""
+    if isinstance(template, dict):
+        return {
+            key[:-2] if key.endswith(".$") else key:
+                evaluate(value, data, context) if key.endswith(".$") else resolve(value, data, context)
+            for key, value in template.items()
+        }
+    if isinstance(template, list):
+        return [resolve(value, data, context) for value in template]
+    return template
+
+def _apply_result_path(result_path, data, result):
+    if result_path is None:
+        return data
+    if result_path == "$":
+        return result
+    data = dict(data)
+    target = data
+    names = [name for name, _ in PATH_SEGMENT.findall(result_path[1:])]
+    for name in names[:-1]:
+        target[name] = dict(target.get(name, {}))
+        target = target[name]
+    target[names[-1]] = result
+    return data
+
+def run_states(states, start_at, data, invoke_task, context=None):
+    """Run a chain of Task and Pass states and return its output.
+
+    invoke_task(state_name, resource, parameters, data) is called for every Task state and
+    returns the result of the service call.
+    """
+    context = context or {}
+    name = start_at
+    while True:
+        state = states[name]
+        parameters = resolve(state["Parameters"], data, context) if "Parameters" in state else data
+        if state["Type"] == "Task":
+            result = invoke_task(name, state["Resource"], parameters, data)
+        elif state["Type"] == "Pass":
+            result = parameters
+        else:
+            raise ValueError("State type {} is not supported".format(state["Type"]))
+        if "ResultSelector" in state:
+            result = resolve(state["ResultSelector"], result, context)
+        data = _apply_result_path(state.get("ResultPath", "$"), data, result)
+        if state.get("End"):
+            return data
+        name = state["Next"]
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# Benchmark of the activity clustering stage on the bundled input dataset.
+#
+# Usage: python benchmarks/cluster_activities_benchmark.py [--threshold 0.8] [--input path/to/activities.csv]
+
+import argparse
+import csv
+import sys
+import time
+from os import path
+
+package_dir = path.normpath(path.join(__file__, "../../guidance_for_environmental_impact_factor_mapping_on_aws"))
+sys.path.insert(0, path.join(package_dir, "glue_scripts"))
+
+from cluster_activities import assign_clusters
+
+parser = argparse.ArgumentParser(description="Time the clustering of near-duplicate activities")
+parser.add_argument("--input", default=path.join(package_dir, "assets/input/activities.csv"))
+parser.add_argument("--threshold", type=float, default=0.8)
+args = parser.parse_args()
+
+with open(args.input, newline="", encoding="utf-8-sig") as f:
+    rows = list(csv.DictReader(f))
+
+start = time.perf_counter()
+cluster_count = sum(1 for _, _, is_representative in assign_clusters(rows, threshold=args.threshold) if is_representative)
+elapsed = time.perf_counter() - start
+
+print("Input file:          {}".format(args.input))
+print("Threshold:           {}".format(args.threshold))
+print("Activities:          {}".format(len(rows)))
+print("Clusters:            {}".format(cluster_count))
+print("Mapping calls saved: {} ({:.1%})".format(len(rows) - cluster_count, 1 - cluster_count / len(rows)))
+print("Clustering time:     {:.2f} s ({:.0f} activities/s)".format(elapsed, len(rows) / elapsed))
@@ -0,0 +1,91 @@
+import json
+import platform
+import sys
+import time
+from os import path
+
+import pytest
+
+package_dir = path.normpath(path.join(__file__, "../../guidance_for_environmental_impact_factor_mapping_on_aws"))
+# Glue scripts are deployed as standalone files, so they are imported from their directory
+sys.path.insert(0, path.join(package_dir, "glue_scripts"))
+
+_results = {}
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--benchmark-results",
+        default=None,
+        help="JSON file the benchmark results are written to, results are not written if not set"
+    )
+    parser.addoption(
+        "--run-large",
+        action="store_true",
+        default=False,
+        help="Also run the benchmarks marked as large, such as the 1M row formatting run"
+    )
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "large: long running benchmark, only run with --run-large")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-large"):
+        return
+    skip_large = pytest.mark.skip(reason="large benchmark, run with --run-large")
+    for item in items:
+        if "large" in item.keywords:
+            item.add_marker(skip_large)
+
+@pytest.fixture(scope="session")
+def package_path():
+    return package_dir
+
+@pytest.fixture(scope="session")
+def synthesized():
+    """Template of EifmStack and the time it took to synthesize."""
+    cdk = pytest.importorskip("aws_cdk")
+    from aws_cdk.assertions import Template
+    from guidance_for_environmental_impact_factor_mapping_on_aws.eifm_stack import EifmStack
+
+    start = time.perf_counter()
+    app = cdk.App()
+    stack = EifmStack(app, construct_id="EIFMappingStack")
+    template = Template.from_stack(stack)
+    return template, time.perf_counter() - start
+
+@pytest.fixture(scope="session")
+def definition(synthesized):
+    """Amazon States Language definition of the synthesized state machine."""
+    template, _ = synthesized
+    (state_machine,) = template.find_resources("AWS::StepFunctions::StateMachine").values()
+    definition = state_machine["Properties"]["DefinitionString"]
+    if isinstance(definition, dict):
+        # Fn::Join of literal JSON and tokens such as the bucket name, which are only found inside strings
+        definition = "".join(part if isinstance(part, str) else "TOKEN" for part in definition["Fn::Join"][1])
+    return json.loads(definition)
+
+@pytest.fixture(scope="session")
+def spark():
+    """Local Spark session standing in for the Glue job's."""
+    pyspark_sql = pytest.importorskip("pyspark.sql")
+    spark = pyspark_sql.SparkSession.builder.master("local[*]").appName("eif-benchmarks").getOrCreate()
+    yield spark
+    spark.stop()
+
+@pytest.fixture
+def record(request):
+    """Record the figures of a benchmark under the name of the test."""
+    def _record(**figures):
+        _results.setdefault(request.node.name, {}).update(figures)
+    return _record
+
+def pytest_sessionfinish(session, exitstatus):
+    results_path = session.config.getoption("--benchmark-results")
+    if not results_path or not _results:
+        return
+    with open(results_path, "w") as f:
+        json.dump({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python_version": platform.python_version(),
+            "results": _results
+        }, f, indent=2, sort_keys=True)
@@ -0,0 +1,59 @@
+# Checks how the formatting job parses the optional spend column and the totals it writes.
+import pytest
+
+pytest.importorskip("pyspark")
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType
+
+from emission_factors import add_emissions, summarize_emissions
+
+FACTORS = {"CO2e": 0.5, "CO2eWithoutMargins": 0.4, "CO2eMargins": 0.1}
+
+def mapped_factors(spark, spends, spend_type):
+    schema = StructType(
+        [StructField("MappedNAICSCode", StringType()), StructField("ContractName", StringType()), StructField("Spend", spend_type)]
+        + [StructField(factor, DoubleType()) for factor in FACTORS]
+    )
+    rows = [("326122", "Contract " + str(index % 2), spend, *FACTORS.values()) for index, spend in enumerate(spends)]
+    return spark.createDataFrame(rows, schema)
+
+def test_spend_text_is_parsed(spark):
+    df = mapped_factors(spark, ["$1,234.50", "", "n/a", "100"], StringType())
+    rows = add_emissions(df, "Spend").collect()
+
+    assert [row.Spend for row in rows] == [1234.5, None, None, 100.0]
+    for row in rows:
+        for factor, value in FACTORS.items():
+            expected = None if row.Spend is None else pytest.approx(row.Spend * value)
+            assert row["Kg" + factor] == expected
+
+def test_numeric_spend_column_is_parsed(spark):
+    df = mapped_factors(spark, [250.0, None], DoubleType())
+    rows = add_emissions(df, "Spend").collect()
+
+    assert [row.Spend for row in rows] == [250.0, None]
+    assert [row.KgCO2e for row in rows] == [pytest.approx(125.0), None]
+    assert [row.KgCO2eWithoutMargins for row in rows] == [pytest.approx(100.0), None]
+    assert [row.KgCO2eMargins for row in rows] == [pytest.approx(25.0), None]
+
+def test_summary_totals(spark):
+    df = add_emissions(mapped_factors(spark, ["$1,234.50", "", "n/a", "100"], StringType()), "Spend")
+    summaries = {name: summary.collect() for name, summary in summarize_emissions(df, "Spend").items()}
+
+    for name, column, key in [
+        ("summary_by_naics_code", "MappedNAICSCode", "326122"),
+        ("summary_by_naics_sector_2digit", "NAICSSector2Digit", "32"),
+        ("summary_by_naics_sector_3digit", "NAICSSector3Digit", "326")
+    ]:
+        (row,) = summaries[name]
+        assert row[column] == key
+        assert row.ActivityCount == 4
+        assert row.TotalSpend == pytest.approx(1334.5)
+        assert row.TotalKgCO2e == pytest.approx(667.25)
+        assert row.TotalKgCO2eWithoutMargins == pytest.approx(533.8)
+        assert row.TotalKgCO2eMargins == pytest.approx(133.45)
+
+    by_contract = {row.ContractName: row for row in summaries["summary_by_contract"]}
+    assert by_contract["Contract 0"].ActivityCount == 2
+    assert by_contract["Contract 0"].TotalKgCO2e == pytest.approx(617.25)
+    assert by_contract["Contract 1"].ActivityCount == 2
+    assert by_contract["Contract 1"].TotalKgCO2e == pytest.approx(50.0)
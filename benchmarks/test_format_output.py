@@ -0,0 +1,52 @@
+# Runs the emissions and summary logic of the formatting Glue job over generated mapped factors.
+import time
+from os import path
+
+import pytest
+
+pytest.importorskip("pyspark")
+from pyspark.sql import functions as F
+
+from emission_factors import EMISSION_COLUMNS, SUMMARY_LEVELS, add_emissions, summarize_emissions
+
+@pytest.fixture(scope="module")
+def emissions_factors(spark, package_path):
+    return spark.read.csv(
+        path.join(package_path, "assets/datasets/SupplyChainGHGEmissionFactors_v1.3.0_NAICS_CO2e_USD2022.csv"),
+        header=True
+    ).select(
+        F.col("2017 NAICS Code").alias("MappedNAICSCode"),
+        F.col("Supply Chain Emission Factors with Margins").cast("double").alias("CO2e"),
+        F.col("Supply Chain Emission Factors without Margins").cast("double").alias("CO2eWithoutMargins"),
+        F.col("Margins of Supply Chain Emission Factors").cast("double").alias("CO2eMargins")
+    )
+
+def generate_mapped_factors(spark, emissions_factors, rows):
+    """Mapped factors as produced by the join in format_output.py, with a spend column."""
+    codes = [row.MappedNAICSCode for row in emissions_factors.select("MappedNAICSCode").collect()]
+    activities = spark.range(rows).select(
+        F.element_at(F.array(*[F.lit(code) for code in codes]), (F.col("id") % len(codes) + 1).cast("int")).alias("MappedNAICSCode"),
+        F.concat(F.lit("Contract "), (F.col("id") % 500).cast("string")).alias("ContractName"),
+        F.format_string("$%.2f", F.rand(seed=1) * 1000).alias("Spend")
+    )
+    return activities.join(F.broadcast(emissions_factors), "MappedNAICSCode")
+
+@pytest.mark.parametrize("rows", [10_000, 100_000, pytest.param(1_000_000, marks=pytest.mark.large)])
+def test_emissions_and_summaries(spark, emissions_factors, rows, record):
+    mapped_factors = generate_mapped_factors(spark, emissions_factors, rows).cache()
+    mapped_factors.count()
+
+    start = time.perf_counter()
+    mf_df = add_emissions(mapped_factors, "Spend").cache()
+    totals = mf_df.agg(*[F.sum(emissions).alias(emissions) for emissions in EMISSION_COLUMNS.values()]).first()
+    summaries = {name: summary.collect() for name, summary in summarize_emissions(mf_df, "Spend").items()}
+    elapsed = time.perf_counter() - start
+    record(rows=rows, seconds=elapsed, rows_per_second=rows / elapsed)
+
+    assert set(summaries) == set(SUMMARY_LEVELS)
+    for summary in summaries.values():
+        assert sum(row.ActivityCount for row in summary) == rows
+        for emissions in EMISSION_COLUMNS.values():
+            assert sum(row["Total" + emissions] for row in summary) == pytest.approx(totals[emissions])
+    mf_df.unpersist()
+    mapped_factors.unpersist()
@@ -0,0 +1,133 @@
+# Runs the item processor of the synthesized MapEmissionsFactors state against stubbed Bedrock
+# calls, to record the throughput of the chain, the number of model calls and the estimated
+# tokens per activity. The time spent in the stub is recorded separately, so the throughput
+# without it is the cost of the chain itself (payload templates, intrinsic functions and the
+# result paths), not of any model. Prompts,
+# prompt arguments and steps come from the synthesized definition, so changes to the stack show
+# up here. A Task state that is not stubbed below fails the benchmark.
+import csv
+import json
+import math
+import time
+from os import path
+
+import pytest
+
+pytest.importorskip("aws_cdk")
+
+from asl import resolve, run_states
+from cluster_activities import assign_clusters
+
+# Rough token estimate for English text, used in place of the model tokenizer
+CHARS_PER_TOKEN = 4
+
+# Fixed model answers, sized like real ones
+STUB_SEARCH_RESULTS = "\n".join([
+    "326122,Plastics Pipe and Pipe Fitting Manufacturing,Fittings, pipe, plastics, manufacturing",
+    "332919,Other Metal Valve and Pipe Fitting Manufacturing,Fittings, pipe, metal, manufacturing",
+    "423720,Plumbing and Heating Equipment and Supplies (Hydronics) Merchant Wholesalers,Pipe fittings merchant wholesalers"
+])
+STUB_ANSWERS = {
+    "CleanActivityDescription": lambda data: "The item is a " + data["CommodityDescription"].lower(),
+    "GeneratePossibleEIFMatches": lambda data: json.dumps({
+        "NAICSCode1": "326122",
+        "NAICSTitle1": "Plastics Pipe and Pipe Fitting Manufacturing",
+        "NAICSCode2": "332919",
+        "NAICSTitle2": "Other Metal Valve and Pipe Fitting Manufacturing",
+        "NAICSCode3": "423720",
+        "NAICSTitle3": "Plumbing and Heating Equipment and Supplies (Hydronics) Merchant Wholesalers"
+    }, indent=4),
+    "ChooseBestEIFMatch": lambda data: json.dumps({
+        "BestNAICSCode": "326122",
+        "BestNAICSTitle": "Plastics Pipe and Pipe Fitting Manufacturing",
+        "Justification": "The activity is a plastic pipe fitting, which is manufactured by establishments classified under Plastics Pipe and Pipe Fitting Manufacturing."
+    }, indent=4)
+}
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class StubBedrock:
+    """Stands in for the Bedrock Task states, counting calls, estimated tokens and time spent."""
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.seconds = 0.0
+
+    def __call__(self, state_name, resource, parameters, data):
+        start = time.perf_counter()
+        assert state_name in STUB_ANSWERS, "No stub for Task state {} ({})".format(state_name, resource)
+        answer = STUB_ANSWERS[state_name](data)
+        if resource.endswith(":bedrock:invokeModel"):
+            prompt = "".join(
+                content["text"] for message in parameters["Body"]["messages"] for content in message["content"]
+            )
+            result = {"Body": {"content": [{"type": "text", "text": answer}]}}
+        elif resource.endswith(":bedrockagentruntime:retrieveAndGenerate"):
+            configuration = parameters["RetrieveAndGenerateConfiguration"]["KnowledgeBaseConfiguration"]
+            prompt = configuration["GenerationConfiguration"]["PromptTemplate"]["TextPromptTemplate"] \
+                .replace("$query$", parameters["Input"]["Text"]) \
+                .replace("$search_results$", STUB_SEARCH_RESULTS)
+            result = {"Output": {"Text": answer}}
+        else:
+            raise AssertionError("Unexpected resource {} in Task state {}".format(resource, state_name))
+        self.calls += 1
+        self.input_tokens += estimate_tokens(prompt)
+        self.output_tokens += estimate_tokens(answer)
+        self.seconds += time.perf_counter() - start
+        return result
+
+@pytest.fixture(scope="module")
+def activities(package_path):
+    with open(path.join(package_path, "assets/input/activities.csv"), newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+def map_items(definition, items, record, input_rows):
+    """Run every item through the item processor of the MapEmissionsFactors state."""
+    mapping = definition["States"]["MapEmissionsFactors"]
+    processor = mapping["ItemProcessor"]
+    model = StubBedrock()
+    outputs = []
+    start = time.perf_counter()
+    for index, item in enumerate(items):
+        context = {"Map": {"Item": {"Index": index, "Value": item}}}
+        data = resolve(mapping["ItemSelector"], {}, context)
+        outputs.append(run_states(processor["States"], processor["StartAt"], data, model, context))
+    elapsed = time.perf_counter() - start
+    chain_seconds = elapsed - model.seconds
+    record(
+        input_rows=input_rows,
+        mapped_items=len(items),
+        seconds=elapsed,
+        stub_seconds=model.seconds,
+        stub_seconds_per_call=model.seconds / model.calls,
+        items_per_second=len(items) / elapsed,
+        rows_per_second=input_rows / elapsed,
+        items_per_second_excluding_stub=len(items) / chain_seconds,
+        model_calls=model.calls,
+        model_calls_per_row=model.calls / input_rows,
+        input_tokens_per_row=model.input_tokens / input_rows,
+        output_tokens_per_row=model.output_tokens / input_rows
+    )
+    return model, outputs
+
+def test_tokens_per_activity(definition, activities, record):
+    items = [dict(activity, ClusterId=str(index)) for index, activity in enumerate(activities)]
+    model, outputs = map_items(definition, items, record, len(activities))
+
+    assert len(outputs) == len(activities)
+    assert model.calls == len(STUB_ANSWERS) * len(activities)
+    assert all(output["MappedNAICSCode"] == "326122" for output in outputs)
+
+def test_tokens_per_activity_with_clustering(definition, activities, record):
+    representatives = [
+        dict(activity, ClusterId=str(cluster_id))
+        for activity, cluster_id, is_representative in assign_clusters(activities)
+        if is_representative
+    ]
+    model, outputs = map_items(definition, representatives, record, len(activities))
+
+    assert [output["ClusterId"] for output in outputs] == [item["ClusterId"] for item in representatives]
+    assert model.calls == len(STUB_ANSWERS) * len(representatives) < len(STUB_ANSWERS) * len(activities)
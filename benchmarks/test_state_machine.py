@@ -0,0 +1,43 @@
+# Synthesizes EifmStack and checks the shape of the state machine, so that changes such as
+# serializing the map or adding per-item model calls show up as failures.
+import pytest
+
+pytest.importorskip("aws_cdk")
+
+from asl import walk_states
+
+EXPECTED_STATE_COUNT = 10
+EXPECTED_TRANSITION_COUNT = 7
+EXPECTED_MAX_CONCURRENCY = 5
+EXPECTED_BEDROCK_CALLS_PER_ITEM = 3
+
+def test_state_machine_shape(synthesized, definition, record):
+    _, synth_seconds = synthesized
+    states = list(walk_states(definition["States"]))
+    transitions = sum(1 for _, state in states if "Next" in state)
+    record(synth_seconds=synth_seconds, state_count=len(states), transition_count=transitions)
+
+    assert len(states) == EXPECTED_STATE_COUNT
+    assert transitions == EXPECTED_TRANSITION_COUNT
+
+def test_mapping_runs_as_distributed_map(definition, record):
+    mapping = definition["States"]["MapEmissionsFactors"]
+    record(max_concurrency=mapping.get("MaxConcurrency"))
+
+    assert mapping["Type"] == "Map"
+    assert mapping["ItemProcessor"]["ProcessorConfig"]["Mode"] == "DISTRIBUTED"
+    assert mapping["MaxConcurrency"] == EXPECTED_MAX_CONCURRENCY
+    assert mapping["ItemReader"]["Parameters"]["Key"] == "clustered/representatives.csv"
+
+def test_bedrock_calls_per_item(definition, record):
+    item_states = definition["States"]["MapEmissionsFactors"]["ItemProcessor"]["States"]
+    bedrock_tasks = [
+        state for _, state in walk_states(item_states)
+        if state["Type"] == "Task" and "bedrock" in state["Resource"]
+    ]
+    record(bedrock_calls_per_item=len(bedrock_tasks))
+
+    assert len(bedrock_tasks) == EXPECTED_BEDROCK_CALLS_PER_ITEM
+    # Every model call must retry when throttled
+    for state in bedrock_tasks:
+        assert any("ThrottlingException" in retry["ErrorEquals"] for retry in state.get("Retry", []))
@@ -133,6 +133,13 @@ class EifmStack(Stack):
                 eif_bucket.arn_for_objects("*")
             ]
         ))
+        cleaning_job_arguments = {
+            "--extra-py-files": "s3://{}/glue_scripts/emission_factors.py".format(eif_bucket.bucket_name)
+        }
+        # Optional input column with the spend of each activity, set with `cdk deploy -c spend_column=<column>`
+        spend_column = self.node.try_get_context("spend_column")
+        if spend_column:
+            cleaning_job_arguments["--spend_column"] = spend_column
         glue_job = glue.CfnJob(self, "CreateGlueCleaningJob",
             command=glue.CfnJob.JobCommandProperty(
                 name="glueetl",
@@ -141,14 +148,45 @@ class EifmStack(Stack):
             ),
             name="eif-cleaning-job",
             role=glue_role.role_arn,
+            glue_version="4.0",
             number_of_workers=2,
-            worker_type="G.1X"
+            worker_type="G.1X",
+            default_arguments=cleaning_job_arguments
         )
         glue_job.node.add_dependency(glue_script_deployment)
+        # Python shell job that clusters near-duplicate activities before mapping
+        clustering_job = glue.CfnJob(self, "CreateGlueClusteringJob",
+            command=glue.CfnJob.JobCommandProperty(
+                name="pythonshell",
+                python_version="3.9",
+                script_location="s3://{}/glue_scripts/cluster_activities.py".format(eif_bucket.bucket_name)
+            ),
+            name="eif-clustering-job",
+            role=glue_role.role_arn,
+            glue_version="3.0",
+            max_capacity=1,
+            default_arguments={
+                "--input_key": "input/activities.csv",
+                "--similarity_threshold": "0.8"
+            }
+        )
+        clustering_job.node.add_dependency(glue_script_deployment)
    
         #---------------------------------------------------------------------------
         # Step Functions
         #---------------------------------------------------------------------------
+        # Step 0: Cluster near-duplicate activities so that one mapping serves a whole cluster
+        run_clustering_job = tasks.GlueStartJobRun(
+            self,
+            "ClusterSimilarActivities",
+            glue_job_name=clustering_job.name,
+            integration_pattern=sfn.IntegrationPattern.RUN_JOB,
+            arguments=sfn.TaskInput.from_object({
+                "--EIF_bucket": eif_bucket.bucket_name
+            }),
+            result_path=sfn.JsonPath.DISCARD
+        )
+
         # Step 1: Clean activity description using LLM
         clean_activity_description = tasks.BedrockInvokeModel(
             self,
@@ -274,6 +312,7 @@ class EifmStack(Stack):
                 "CommodityDescription.$": "$.CommodityDescription",
                 "ExtendedDescription.$": "$.ExtendedDescription",
                 "ContractName.$": "$.ContractName",
+                "ClusterId.$": "$.ClusterId",
                 "SimplifiedDescription.$": "$.CleanedActivity.SimplifiedDescription",
                 "PossibleMatches.$": "$.PossibleMatches.NAICSOptions",
                 "MappedNAICSCode.$": "$.MappedEIF.BestChoice.BestNAICSCode",
@@ -298,14 +337,15 @@ class EifmStack(Stack):
             tolerated_failure_percentage=10,
             item_reader=sfn.S3CsvItemReader(
                 bucket=eif_bucket,
-                key="input/activities.csv",
+                key="clustered/representatives.csv",
                 csv_headers=sfn.CsvHeaders.use_first_row()
             ),
             item_selector={
                 "Commodity.$": "$$.Map.Item.Value.Commodity",
                 "CommodityDescription.$": "$$.Map.Item.Value.CommodityDescription",
                 "ExtendedDescription.$": "$$.Map.Item.Value.ExtendedDescription",
-                "ContractName.$": "$$.Map.Item.Value.ContractName"
+                "ContractName.$": "$$.Map.Item.Value.ContractName",
+                "ClusterId.$": "$$.Map.Item.Value.ClusterId"
             },
             result_writer=sfn.ResultWriter(
                 bucket=eif_bucket,
@@ -366,7 +406,7 @@ class EifmStack(Stack):
         )
 
         ### Put all the steps together into the complete state machine
-        full_chain = eif_mapping.next(read_manifest.next(move_successes.next(run_glue_job)))
+        full_chain = run_clustering_job.next(eif_mapping).next(read_manifest.next(move_successes.next(run_glue_job)))
         eif_sfn = sfn.StateMachine(
             self,
             "EIFMappingStateMachine",
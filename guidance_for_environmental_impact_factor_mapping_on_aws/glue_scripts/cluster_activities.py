@@ -0,0 +1,152 @@
+import csv
+import re
+import sys
+import tempfile
+import zlib
+from array import array
+from os import path
+
+# Receiving-line boilerplate that appears in most extended descriptions and carries no information about the activity
+BOILERPLATE_PATTERN = re.compile(r"RC\s*LN|QTY\s*DEL|P/F|B/O|DEL\s*DATE|DELIVERY\s+DATE\s+SHALL\s+BE\s+NO\s+LATER\s+THAN")
+# Sizes and quantities such as 3, 1-1/2, 2 X 8 IN, 100 FT or 3/4 INCH
+SIZE_PATTERN = re.compile(
+    r"\d+(?:[-/.]\d+)*\s*(?:\"|'|INCH(?:ES)?\b|IN\b|FT\b|MM\b|CM\b|LBS?\b|OZ\b|GAL\b|PK\b|EA\b)?"
+    r"(?:\s*[X*]\s*\d+(?:[-/.]\d+)*\s*(?:\"|'|INCH(?:ES)?\b|IN\b|FT\b|MM\b|CM\b|LBS?\b|OZ\b|GAL\b|PK\b|EA\b)?)*"
+)
+# Apparel sizes such as SZ LARGE or SIZE 36
+SIZE_WORD_PATTERN = re.compile(r"\b(?:SZ|SIZE)\s+\S+|\b(?:SMALL|MEDIUM|LARGE|X{1,3}L|[2-5]XL)\b")
+NON_WORD_PATTERN = re.compile(r"[^A-Z#]+")
+
+SHINGLE_SIZE = 4
+NUM_BINS = 64
+BANDS = 16
+GOLDEN_RATIO_64 = 0x9E3779B97F4A7C15
+MASK_64 = (1 << 64) - 1
+MASK_32 = (1 << 32) - 1
+
+def mask_activity_text(text):
+    """Normalize a description and replace size and quantity tokens with '#'."""
+    text = BOILERPLATE_PATTERN.sub(" ", text.upper())
+    text = SIZE_PATTERN.sub(" # ", text)
+    text = SIZE_WORD_PATTERN.sub(" # ", text)
+    return " ".join(NON_WORD_PATTERN.sub(" ", text).split())
+
+def activity_key(row):
+    """Masked text used to compare two activities."""
+    description = mask_activity_text(row["CommodityDescription"])
+    extended = mask_activity_text(row["ExtendedDescription"])
+    return description + " | " + extended if extended else description
+
+def _minhash(text):
+    """One-permutation MinHash signature of the character shingles in text.
+
+    Each shingle is hashed once and kept only if it is the minimum of its bin, so the cost is
+    linear in the length of the text. Empty bins borrow the value of the next non-empty bin,
+    mixed with their distance to it, so that short texts still produce comparable signatures.
+    Bins are truncated to 32 bits to keep signatures compact.
+    """
+    bins = [None] * NUM_BINS
+    for i in range(max(len(text) - SHINGLE_SIZE + 1, 1)):
+        h = (zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8")) * GOLDEN_RATIO_64) & MASK_64
+        b, value = h % NUM_BINS, h // NUM_BINS
+        if bins[b] is None or value < bins[b]:
+            bins[b] = value
+    signature = array("I", bytes(4 * NUM_BINS))
+    borrowed, distance = 0, 0
+    for i in reversed(range(2 * NUM_BINS)):
+        b = i % NUM_BINS
+        if bins[b] is not None:
+            borrowed, distance = bins[b], 0
+        else:
+            distance += 1
+        if i < NUM_BINS:
+            signature[b] = (borrowed ^ (distance * GOLDEN_RATIO_64)) & MASK_32
+    return signature
+
+def _similarity(signature1, signature2):
+    return sum(1 for x, y in zip(signature1, signature2) if x == y) / NUM_BINS
+
+def assign_clusters(rows, threshold=0.8, commodity_prefix_length=3):
+    """Yield (row, cluster id, is representative) for every activity row, in order.
+
+    Rows are first grouped by their masked text, so exact duplicates up to size tokens cost a
+    single dictionary lookup. Other rows are compared with MinHash LSH to the representatives
+    (first rows) of the clusters sharing one of their bands, and join the most similar one if
+    its estimated Jaccard similarity over character shingles reaches the threshold. Otherwise
+    they become the representative of a new cluster. Every member is therefore similar to the
+    representative whose mapping it inherits. Only rows whose commodity codes share the first
+    commodity_prefix_length digits (the NIGP class) are compared.
+
+    Rows are processed in a single pass with constant work per row, and only the signatures and
+    band hashes of representatives are kept, so rows can be streamed and written as they come.
+    Cluster ids are numbered by first appearance in rows.
+    """
+    rows_per_band = NUM_BINS // BANDS
+    key_clusters = {}   # hash of commodity class and masked text -> cluster id
+    band_clusters = {}  # hash of commodity class, band and band values -> cluster id
+    signatures = []     # signature of the representative of each cluster
+    for row in rows:
+        block = row["Commodity"][:commodity_prefix_length]
+        text = activity_key(row)
+        key = hash((block, text))
+        cluster_id = key_clusters.get(key)
+        if cluster_id is not None:
+            yield row, cluster_id, False
+            continue
+
+        signature = _minhash(text)
+        band_keys = [
+            hash((block, band, signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes()))
+            for band in range(BANDS)
+        ]
+        best_similarity = threshold
+        for candidate in {band_clusters[band_key] for band_key in band_keys if band_key in band_clusters}:
+            similarity = _similarity(signature, signatures[candidate])
+            if similarity >= best_similarity:
+                cluster_id, best_similarity = candidate, similarity
+
+        is_representative = cluster_id is None
+        if is_representative:
+            cluster_id = len(signatures)
+            signatures.append(signature)
+            for band_key in band_keys:
+                band_clusters.setdefault(band_key, cluster_id)
+        key_clusters[key] = cluster_id
+        yield row, cluster_id, is_representative
+
+def main():
+    import boto3
+    from awsglue.utils import getResolvedOptions
+
+    args = getResolvedOptions(sys.argv, ['EIF_bucket', 'input_key', 'similarity_threshold'])
+    s3 = boto3.client('s3')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = path.join(tmp, 'activities.csv')
+        representatives_path = path.join(tmp, 'representatives.csv')
+        assignments_path = path.join(tmp, 'cluster_assignments.csv')
+        s3.download_file(args['EIF_bucket'], args['input_key'], input_path)
+
+        # Stream the input activities and write each row as soon as its cluster is known
+        with open(input_path, newline='', encoding='utf-8-sig') as input_file, \
+                open(representatives_path, 'w', newline='', encoding='utf-8') as representatives_file, \
+                open(assignments_path, 'w', newline='', encoding='utf-8') as assignments_file:
+            reader = csv.DictReader(input_file)
+            fieldnames = reader.fieldnames + ["ClusterId"]
+            representatives = csv.DictWriter(representatives_file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+            assignments = csv.DictWriter(assignments_file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+            representatives.writeheader()
+            assignments.writeheader()
+            for row, cluster_id, is_representative in assign_clusters(reader, threshold=float(args['similarity_threshold'])):
+                row["ClusterId"] = cluster_id
+                assignments.writerow(row)
+                if is_representative:
+                    representatives.writerow(row)
+
+        # One representative per cluster is sent through the mapping chain
+        s3.upload_file(representatives_path, args['EIF_bucket'], 'clustered/representatives.csv')
+        # Every input activity with its cluster, used to propagate the mapping in the formatting job
+        s3.upload_file(assignments_path, args['EIF_bucket'], 'clustered/cluster_assignments.csv')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from pyspark.sql import functions as F
+
+# Emission factor columns (kg CO2e/2022 USD) and the emissions computed from them
+EMISSION_COLUMNS = {
+    "CO2e": "KgCO2e",
+    "CO2eWithoutMargins": "KgCO2eWithoutMargins",
+    "CO2eMargins": "KgCO2eMargins"
+}
+
+# Summary tables written next to matched_factors.csv, with the column they are grouped by
+SUMMARY_LEVELS = {
+    "summary_by_naics_code": ("MappedNAICSCode", F.col("MappedNAICSCode")),
+    "summary_by_contract": ("ContractName", F.col("ContractName")),
+    "summary_by_naics_sector_2digit": ("NAICSSector2Digit", F.substring("MappedNAICSCode", 1, 2)),
+    "summary_by_naics_sector_3digit": ("NAICSSector3Digit", F.substring("MappedNAICSCode", 1, 3))
+}
+
+def add_emissions(mapped_factors, spend_column):
+    """Multiply the spend of every activity by its emission factors.
+
+    The spend column is parsed as 2022 USD, ignoring currency symbols and thousands
+    separators, and one kg CO2e column is added per emission factor column.
+    """
+    # Parse the column as text, whatever type it was read with, so that all formats go through the same path
+    spend = F.regexp_replace(F.col(spend_column).cast("string"), "[$,]", "").cast("double")
+    mapped_factors = mapped_factors.withColumn(spend_column, spend)
+    return mapped_factors.select(
+        "*",
+        *[(F.col(spend_column) * F.col(factor)).alias(emissions) for factor, emissions in EMISSION_COLUMNS.items()]
+    )
+
+def summarize_emissions(mapped_factors, spend_column=None):
+    """Aggregate activities by NAICS code, contract, and 2 and 3 digit NAICS sector.
+
+    Every activity is expanded into one row per summary level before a single group by, so all
+    summaries are computed in the same scan of the mapped factors. Returns a dict of summary
+    name to DataFrame.
+    """
+    levels = F.array(*[
+        F.struct(F.lit(name).alias("Level"), key.cast("string").alias("Key"))
+        for name, (_, key) in SUMMARY_LEVELS.items()
+    ])
+    measures = [F.count(F.lit(1)).alias("ActivityCount")]
+    if spend_column:
+        measures.append(F.sum(spend_column).alias("TotalSpend"))
+        measures.extend(F.sum(emissions).alias("Total" + emissions) for emissions in EMISSION_COLUMNS.values())
+
+    summaries = mapped_factors.select(F.explode(levels).alias("Group"), "*") \
+        .groupBy(F.col("Group.Level").alias("Level"), F.col("Group.Key").alias("Key")) \
+        .agg(*measures) \
+        .cache()
+    return {
+        name: summaries.filter(F.col("Level") == name).drop("Level").withColumnRenamed("Key", column).orderBy(column)
+        for name, (column, _) in SUMMARY_LEVELS.items()
+    }
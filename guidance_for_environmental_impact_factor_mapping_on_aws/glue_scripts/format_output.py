@@ -5,16 +5,19 @@ from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
 from awsglue.context import GlueContext
 from awsglue.dynamicframe import DynamicFrame
+from emission_factors import add_emissions, summarize_emissions
 
 # Define the input and output paths
 args = getResolvedOptions(sys.argv, ['EIF_bucket'])
+# Optional name of the input column holding the spend of each activity in 2022 USD
+spend_column = getResolvedOptions(sys.argv, ['spend_column'])['spend_column'] if '--spend_column' in sys.argv else None
 
 # Create a Spark context and Glue context
 sc = SparkContext()
 glueContext = GlueContext(sc)
 
 # Create dynamic frame from the JSON output of the mapping runs
-mapped_activities = glueContext.create_dynamic_frame.from_options(
+mapped_representatives = glueContext.create_dynamic_frame.from_options(
     connection_type="s3",
     connection_options={"paths": ["s3://" + args['EIF_bucket'] + "/successful-mappings/"]},
     format="json",
@@ -22,24 +25,42 @@ mapped_activities = glueContext.create_dynamic_frame.from_options(
         "jsonPath": "$"
     }
 )
-mapped_activities = mapped_activities.unbox("Output", "json") # convert string value to json
-mapped_activities = mapped_activities.unnest() # flatten json
-mapped_activities = mapped_activities.apply_mapping( # rename and drop columns
+mapped_representatives = mapped_representatives.unbox("Output", "json") # convert string value to json
+mapped_representatives = mapped_representatives.unnest() # flatten json
+mapped_representatives = mapped_representatives.apply_mapping( # rename and drop columns
     mappings=[
-        ("`Output.ExtendedDescription`", "ExtendedDescription", "string"),
+        ("`Output.ClusterId`", "MappedClusterId", "string"),
         ("`Output.MappedNAICSTitle`", "MappedNAICSTitle", "string"),
         ("`Output.MappedNAICSCode`", "MappedNAICSCode", "string"),
-        ("`Output.CommodityDescription`", "CommodityDescription", "string"),
-        ("`Output.Commodity`", "Commodity", "string"),
         ("`Output.MappingJustification`", "MappingJustification", "string"),
         ("`Output.SimplifiedDescription`", "SimplifiedDescription", "string"),
-        ("`Output.ContractName`", "ContractName", "string"),
         ("`Output.PossibleMatches.NAICSCode1`", "PossibleNAICSCode1", "string"),
         ("`Output.PossibleMatches.NAICSCode2`", "PossibleNAICSCode2", "string"),
         ("`Output.PossibleMatches.NAICSCode3`", "PossibleNAICSCode3", "string")
     ]
 )
 
+# Create dynamic frame from the cluster of every input activity
+# Read without type inference so that every input column stays a string, like the fields of the mapping runs,
+# which keeps the leading zeros of commodity codes, lets ClusterId match MappedClusterId, and leaves the
+# optional spend column as text for add_emissions to parse
+cluster_assignments = DynamicFrame.fromDF(
+    glueContext.spark_session.read.csv(
+        "s3://" + args['EIF_bucket'] + "/clustered/cluster_assignments.csv",
+        header=True,
+        inferSchema=False,
+        sep=",",
+        quote='"',
+        escape='"',
+        multiLine=True
+    ),
+    glueContext,
+    "cluster_assignments"
+)
+
+# Propagate the mapping of each cluster representative to all activities in its cluster
+mapped_activities = cluster_assignments.join(paths1=["ClusterId"], paths2=["MappedClusterId"], frame2=mapped_representatives).drop_fields(["MappedClusterId"])
+
 # Create dynamic frame from emissions factor data
 emissions_factors = glueContext.create_dynamic_frame.from_options(
     connection_type="s3",
@@ -54,48 +75,17 @@ emissions_factors = glueContext.create_dynamic_frame.from_options(
 emissions_factors = emissions_factors.apply_mapping( # rename and drop columns
     mappings=[
         ("2017 NAICS Code", "2017NAICSCode", "string"),
-        ("Supply Chain Emission Factors with Margins", "CO2e", "string"),
+        ("Supply Chain Emission Factors with Margins", "CO2e", "double"),
+        ("Supply Chain Emission Factors without Margins", "CO2eWithoutMargins", "double"),
+        ("Margins of Supply Chain Emission Factors", "CO2eMargins", "double"),
         ("Reference USEEIO Code", "USEEIOCode", "string")
     ]
 )
 
-# Merge frames to create final outputs
-# Inner join to get all activities with valid NAICS codes
-mapped_factors = mapped_activities.join(paths1=["MappedNAICSCode"], paths2=["2017NAICSCode"], frame2=emissions_factors).drop_fields(["2017NAICSCode"])
-
-# Write output as CSV and rename to be human readable
-# For large datasets, use Athena and Quicksight for interacting with results instead
-mapped_factors = mapped_factors.coalesce(1)
-glueContext.write_dynamic_frame.from_options(
-    frame=mapped_factors,
-    connection_type="s3",
-    connection_options={"path": "s3://" + args['EIF_bucket'] + "/output"},
-    format="csv",
-    format_options={
-        "writeHeader": True,
-        "separator": ",",
-        "quoteChar": '"'
-    }
-)
-s3 = boto3.client('s3')
-objects = s3.list_objects_v2(Bucket=args['EIF_bucket'], Prefix="output/")
-for obj in objects['Contents']:
-    if obj['Key'].startswith('output/run-'):
-        s3.copy_object(
-            CopySource={'Bucket': args['EIF_bucket'], 'Key': obj['Key']},
-            Bucket=args['EIF_bucket'],
-            Key='output/matched_factors.csv'
-        )
-        s3.delete_object(Bucket=args['EIF_bucket'], Key=obj['Key'])
-
-# Left anti join to get activities without a valid NAICS code. This catches any activities that may be matched to nonexistant codes. 
-ma_df = mapped_activities.toDF()
-ef_df = emissions_factors.toDF()
-no_match_factors = DynamicFrame.fromDF(ma_df.join(ef_df, (ma_df['MappedNAICSCode']==ef_df['2017NAICSCode']), "left_anti"), glueContext, "no_match_activities")
-if no_match_factors.count() > 0:
-    no_match_factors = no_match_factors.coalesce(1)
+# Write a frame as a single CSV file under the output prefix and rename it to be human readable
+def write_output_csv(frame, key):
     glueContext.write_dynamic_frame.from_options(
-        frame=no_match_factors,
+        frame=frame.coalesce(1),
         connection_type="s3",
         connection_options={"path": "s3://" + args['EIF_bucket'] + "/output"},
         format="csv",
@@ -112,6 +102,40 @@ if no_match_factors.count() > 0:
             s3.copy_object(
                 CopySource={'Bucket': args['EIF_bucket'], 'Key': obj['Key']},
                 Bucket=args['EIF_bucket'],
-                Key='output/mismatched_factors.csv'
+                Key=key
             )
-            s3.delete_object(Bucket=args['EIF_bucket'], Key=obj['Key'])
\ No newline at end of file
+            s3.delete_object(Bucket=args['EIF_bucket'], Key=obj['Key'])
+
+# Merge frames to create final outputs
+# Inner join to get all activities with valid NAICS codes
+mapped_factors = mapped_activities.join(paths1=["MappedNAICSCode"], paths2=["2017NAICSCode"], frame2=emissions_factors).drop_fields(["2017NAICSCode"])
+
+# Compute the emissions of every activity from its spend, if the input has a spend column
+# The frame is cached since both the output file and the summaries are computed from it
+mf_df = mapped_factors.toDF()
+if spend_column:
+    mf_df = add_emissions(mf_df, spend_column)
+mf_df = mf_df.cache()
+
+# Write output as CSV and rename to be human readable
+# For large datasets, use Athena and Quicksight for interacting with results instead
+write_output_csv(DynamicFrame.fromDF(mf_df, glueContext, "mapped_factors"), 'output/matched_factors.csv')
+
+# Write summary tables by NAICS code, contract and NAICS sector next to the output file
+for name, summary in summarize_emissions(mf_df, spend_column).items():
+    write_output_csv(DynamicFrame.fromDF(summary, glueContext, name), 'output/' + name + '.csv')
+
+# Left anti join to get activities without a valid NAICS code. This catches any activities that may be matched to nonexistant codes. 
+ma_df = mapped_activities.toDF()
+ef_df = emissions_factors.toDF()
+no_match_factors = DynamicFrame.fromDF(ma_df.join(ef_df, (ma_df['MappedNAICSCode']==ef_df['2017NAICSCode']), "left_anti"), glueContext, "no_match_activities")
+if no_match_factors.count() > 0:
+    write_output_csv(no_match_factors, 'output/mismatched_factors.csv')
+
+# Left anti join to get activities whose cluster representative failed to map. A failed mapping run drops every
+# activity of its cluster, so they are written out instead of silently disappearing from the inner join above.
+ca_df = cluster_assignments.toDF()
+mr_df = mapped_representatives.toDF()
+unmapped_activities = DynamicFrame.fromDF(ca_df.join(mr_df, (ca_df['ClusterId']==mr_df['MappedClusterId']), "left_anti"), glueContext, "unmapped_activities")
+if unmapped_activities.count() > 0:
+    write_output_csv(unmapped_activities, 'output/unmapped_activities.csv')